@@ -11,49 +11,141 @@ Run with:
     docker compose run --rm app python evaluation/evaluation.py [options]
 """
 import os
+import re
 import sys
 import json
 import uuid
+import functools
 import platform
 import subprocess
 import shutil
+import signal
+import tempfile
+import threading
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+
+# Matches lines like: tests/test_before.py::test_before_matches_reference_vectors PASSED
+# or, under pytest-xdist: [gw0] [ 50%] PASSED tests/test_before.py::test_...
+_PYTEST_RE = re.compile(
+    r"^\s*(?:(?P<nodeid>\S+::\S+)\s+(?P<outcome>PASSED|FAILED|ERROR|SKIPPED)\b"
+    r"|\[gw\d+\]\s+\[\s*\d+%\]\s+(?P<xdist_outcome>PASSED|FAILED|ERROR|SKIPPED)\s+(?P<xdist_nodeid>\S+::\S+))",
+    re.M,
+)
+
+
+def dump_report(report):
+    """Serialize the report to indented JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(report, option=orjson.OPT_INDENT_2)
+    return json.dumps(report, indent=2).encode("utf-8")
+
 
 def generate_run_id():
     """Generate a short unique run ID."""
     return uuid.uuid4().hex[:8]
 
 
-def get_git_info():
-    """Get git commit and branch information."""
-    git_info = {"git_commit": "unknown", "git_branch": "unknown"}
+@functools.lru_cache(maxsize=1)
+def _read_git_info():
+    """Return (commit, branch) from a single git call, cached per process."""
     try:
         result = subprocess.run(
-            ["git", "rev-parse", "HEAD"],
+            ["git", "rev-parse", "HEAD", "--abbrev-ref", "HEAD"],
             capture_output=True,
             text=True,
             timeout=5
         )
-        if result.returncode == 0:
-            git_info["git_commit"] = result.stdout.strip()[:8]
+        lines = result.stdout.splitlines()
+        if result.returncode == 0 and len(lines) == 2:
+            return lines[0].strip()[:8], lines[1].strip()
     except Exception:
         pass
-    
+    return "unknown", "unknown"
+
+
+def get_git_info():
+    """Get git commit and branch information as a fresh dict."""
+    commit, branch = _read_git_info()
+    return {"git_commit": commit, "git_branch": branch}
+
+
+def _kill_process_group(proc):
+    """SIGKILL the child and everything it spawned (it leads its own session)."""
     try:
-        result = subprocess.run(
-            ["git", "rev-parse", "--abbrev-ref", "HEAD"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            git_info["git_branch"] = result.stdout.strip()
-    except Exception:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
         pass
-    
-    return git_info
+
+
+def stream_command(cmd, cwd, env=None, timeout=None, on_line=None,
+                   stdout_limit=3000, stderr_limit=1000):
+    """
+    Run a command, handing each stdout line to on_line as it arrives.
+
+    Only the last stdout_limit/stderr_limit characters are kept (each deque
+    holds that many lines, and every line is at least one character).
+
+    Returns:
+        (returncode, stdout_tail, stderr_tail)
+
+    The command runs in its own session so a timeout also kills descendants
+    (xdist workers, the compose plugin behind the docker CLI) that would
+    otherwise hold the pipes open until they exit on their own.
+
+    Raises:
+        subprocess.TimeoutExpired if the command outlives timeout seconds
+    """
+    stdout_tail = deque(maxlen=stdout_limit)
+    stderr_tail = deque(maxlen=stderr_limit)
+    timed_out = threading.Event()
+
+    # Leaving the with block closes both pipes and reaps the child
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        cwd=cwd,
+        env=env,
+        start_new_session=True,
+    ) as proc:
+        stderr_reader = threading.Thread(target=stderr_tail.extend, args=(proc.stderr,), daemon=True)
+        stderr_reader.start()
+
+        def expire():
+            timed_out.set()
+            _kill_process_group(proc)
+
+        timer = threading.Timer(timeout, expire) if timeout else None
+        if timer:
+            timer.start()
+        try:
+            for line in proc.stdout:
+                stdout_tail.append(line)
+                if on_line:
+                    on_line(line)
+            stderr_reader.join()
+            returncode = proc.wait()
+        except BaseException:
+            # A failing on_line (or Ctrl-C) must not leave the child blocked on a full pipe
+            _kill_process_group(proc)
+            proc.wait()
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return returncode, "".join(stdout_tail)[-stdout_limit:], "".join(stderr_tail)[-stderr_limit:]
 
 
 def get_environment_info():
@@ -91,31 +183,33 @@ def run_pytest_with_pythonpath(pythonpath, tests_dir, label):
     print(f"Tests directory: {tests_dir}")
     
     # Build pytest command
+    report_path = new_json_report_path()
     cmd = [
         sys.executable, "-m", "pytest",
         str(tests_dir),
         "-v",
         "--tb=short",
+        "-n", "auto",
+        "--dist=load",
+        "--json-report",
+        f"--json-report-file={report_path}",
     ]
     
     env = os.environ.copy()
     env["PYTHONPATH"] = pythonpath
     
     try:
-        result = subprocess.run(
+        # Parse verbose output line by line while the tests run
+        tests = []
+        returncode, stdout, stderr = stream_command(
             cmd,
-            capture_output=True,
-            text=True,
             cwd=str(Path(tests_dir).parent),
             env=env,
-            timeout=120
+            timeout=120,
+            on_line=lambda line: tests.extend(parse_pytest_verbose_output(line)),
         )
-        
-        stdout = result.stdout
-        stderr = result.stderr
-        
-        # Parse verbose output to get test results
-        tests = parse_pytest_verbose_output(stdout)
+        # Prefer the structured report; the streamed verbose results are the fallback
+        tests = load_pytest_json_report(report_path) or tests
         
         # Count results
         passed = sum(1 for t in tests if t.get("outcome") == "passed")
@@ -137,8 +231,8 @@ def run_pytest_with_pythonpath(pythonpath, tests_dir, label):
             print(f"  {status_icon} {test.get('nodeid', 'unknown')}: {test.get('outcome', 'unknown')}")
         
         return {
-            "success": result.returncode == 0,
-            "exit_code": result.returncode,
+            "success": returncode == 0,
+            "exit_code": returncode,
             "tests": tests,
             "summary": {
                 "total": total,
@@ -147,8 +241,8 @@ def run_pytest_with_pythonpath(pythonpath, tests_dir, label):
                 "errors": errors,
                 "skipped": skipped,
             },
-            "stdout": stdout[-3000:] if len(stdout) > 3000 else stdout,
-            "stderr": stderr[-1000:] if len(stderr) > 1000 else stderr,
+            "stdout": stdout,
+            "stderr": stderr,
         }
         
     except subprocess.TimeoutExpired:
@@ -171,41 +265,50 @@ def run_pytest_with_pythonpath(pythonpath, tests_dir, label):
             "stdout": "",
             "stderr": "",
         }
+    finally:
+        os.unlink(report_path)
+
+
+def new_json_report_path():
+    """Reserve a temporary file for pytest-json-report to write into."""
+    fd, path = tempfile.mkstemp(prefix="pytest-report-", suffix=".json")
+    os.close(fd)
+    return path
+
+
+def load_pytest_json_report(path):
+    """
+    Read test results from a pytest-json-report file.
+
+    Returns:
+        list of test dicts, or None if the report was not written
+    """
+    try:
+        with open(path) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return [
+        {
+            "nodeid": test["nodeid"],
+            "name": test["nodeid"].rsplit("::", 1)[-1],
+            "outcome": test["outcome"],
+        }
+        for test in report.get("tests", [])
+    ]
 
 
 def parse_pytest_verbose_output(output):
     """Parse pytest verbose output to extract test results."""
     tests = []
-    lines = output.split('\n')
-    
-    for line in lines:
-        line_stripped = line.strip()
-        
-        # Match lines like: tests/test_before.py::test_before_matches_reference_vectors PASSED
-        if '::' in line_stripped:
-            outcome = None
-            if ' PASSED' in line_stripped:
-                outcome = "passed"
-            elif ' FAILED' in line_stripped:
-                outcome = "failed"
-            elif ' ERROR' in line_stripped:
-                outcome = "error"
-            elif ' SKIPPED' in line_stripped:
-                outcome = "skipped"
-            
-            if outcome:
-                # Extract nodeid (everything before the status)
-                for status_word in [' PASSED', ' FAILED', ' ERROR', ' SKIPPED']:
-                    if status_word in line_stripped:
-                        nodeid = line_stripped.split(status_word)[0].strip()
-                        break
-                
-                tests.append({
-                    "nodeid": nodeid,
-                    "name": nodeid.split("::")[-1] if "::" in nodeid else nodeid,
-                    "outcome": outcome,
-                })
-    
+    for match in _PYTEST_RE.finditer(output):
+        nodeid = match.group("nodeid") or match.group("xdist_nodeid")
+        outcome = match.group("outcome") or match.group("xdist_outcome")
+        tests.append({
+            "nodeid": nodeid,
+            "name": nodeid.rsplit("::", 1)[-1],
+            "outcome": outcome.lower(),
+        })
     return tests
 
 
@@ -268,34 +371,29 @@ def run_compose_service(service_name, label=None, timeout=600):
     ]
 
     try:
-        result = subprocess.run(
+        # The service may run pytest or go test; their result lines never
+        # overlap, so each streamed line is offered to both parsers
+        tests = []
+
+        def collect(line):
+            tests.extend(parse_pytest_verbose_output(line))
+            tests.extend(parse_go_test_output(line))
+
+        returncode, stdout, stderr = stream_command(
             cmd,
-            capture_output=True,
-            text=True,
             cwd=str(Path(__file__).parent.parent),
             timeout=timeout,
+            on_line=collect,
         )
 
-        stdout = result.stdout
-        stderr = result.stderr
-
-        # Try to detect whether this output is pytest or go test
-        tests = []
-        if 'pytest' in stdout or 'pytest' in stderr or 'FAILED' in stdout and 'PASSED' in stdout:
-            # parse as pytest verbose output
-            tests = parse_pytest_verbose_output(stdout)
-        else:
-            # attempt to parse as go test output
-            tests = parse_go_test_output(stdout)
-
         passed = sum(1 for t in tests if t.get('outcome') == 'passed')
         failed = sum(1 for t in tests if t.get('outcome') == 'failed')
         skipped = sum(1 for t in tests if t.get('outcome') == 'skipped')
         total = len(tests)
 
         return {
-            "success": result.returncode == 0,
-            "exit_code": result.returncode,
+            "success": returncode == 0,
+            "exit_code": returncode,
             "tests": tests,
             "summary": {
                 "total": total,
@@ -303,8 +401,8 @@ def run_compose_service(service_name, label=None, timeout=600):
                 "failed": failed,
                 "skipped": skipped,
             },
-            "stdout": stdout[-3000:] if len(stdout) > 3000 else stdout,
-            "stderr": stderr[-1000:] if len(stderr) > 1000 else stderr,
+            "stdout": stdout,
+            "stderr": stderr,
         }
 
     except subprocess.TimeoutExpired:
@@ -341,27 +439,26 @@ def run_evaluation():
     # This function will execute these two commands and parse their outputs.
     project_root = Path(__file__).parent.parent
 
-    def run_docker_cmd(cmd_list, label, timeout=900):
+    def run_docker_cmd(cmd_list, label, timeout=900, json_report=None):
         print(f"\n{'=' * 60}")
         print(f"RUNNING: {label}")
         print(f"{'=' * 60}")
         print(' '.join(cmd_list))
         try:
-            result = subprocess.run(
+            # Choose parser based on label
+            if 'pytest' in ' '.join(cmd_list) or 'before' in label.lower():
+                parse = parse_pytest_verbose_output
+            else:
+                parse = parse_go_test_output
+            tests = []
+            returncode, stdout, stderr = stream_command(
                 cmd_list,
-                capture_output=True,
-                text=True,
                 cwd=str(project_root),
                 timeout=timeout,
+                on_line=lambda line: tests.extend(parse(line)),
             )
-            stdout = result.stdout
-            stderr = result.stderr
-
-            # Choose parser based on label
-            if 'pytest' in ' '.join(cmd_list) or 'before' in label.lower():
-                tests = parse_pytest_verbose_output(stdout)
-            else:
-                tests = parse_go_test_output(stdout)
+            if json_report:
+                tests = load_pytest_json_report(json_report) or tests
 
             passed = sum(1 for t in tests if t.get('outcome') == 'passed')
             failed = sum(1 for t in tests if t.get('outcome') == 'failed')
@@ -369,26 +466,31 @@ def run_evaluation():
             total = len(tests)
 
             return {
-                'success': result.returncode == 0,
-                'exit_code': result.returncode,
+                'success': returncode == 0,
+                'exit_code': returncode,
                 'tests': tests,
                 'summary': {'total': total, 'passed': passed, 'failed': failed, 'skipped': skipped},
-                'stdout': stdout[-3000:] if len(stdout) > 3000 else stdout,
-                'stderr': stderr[-1000:] if len(stderr) > 1000 else stderr,
+                'stdout': stdout,
+                'stderr': stderr,
             }
         except subprocess.TimeoutExpired:
             return {'success': False, 'exit_code': -1, 'tests': [], 'summary': {'error': 'timeout'}, 'stdout': '', 'stderr': ''}
 
     # Exact commands (as requested):
+    before_report = new_json_report_path()
     before_cmd = [
-        'python3', '-m', 'pytest', '-v'
+        'python3', '-m', 'pytest', '-v', '-n', 'auto', '--dist=load',
+        '--json-report', f'--json-report-file={before_report}'
     ]
 
     after_cmd = [
         'go', 'test', './...', '-v'
     ]
 
-    before_results = run_docker_cmd(before_cmd, 'before')
+    try:
+        before_results = run_docker_cmd(before_cmd, 'before', json_report=before_report)
+    finally:
+        os.unlink(before_report)
     after_results = run_docker_cmd(after_cmd, 'after')
     
     # Build comparison
@@ -510,8 +612,8 @@ def main():
     
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(output_path, "w") as f:
-        json.dump(report, f, indent=2)
+    # Serialize once and write the buffer in a single call
+    output_path.write_bytes(dump_report(report))
     print(f"\n✅ Report saved to: {output_path}")
     
     print(f"\n{'=' * 60}")
@@ -1,42 +1,133 @@
 # filename: huffman_core.py
 
-import heapq
-from collections import Counter
+import numpy as np
 
-class HuffmanNode:
- def __init__(self, char, freq):
-    self.char = char
-    self.freq = freq
-    self.left = None
-    self.right = None
+# Longest code the canonical header and the 64-bit encode accumulator allow
+MAX_CODE_LENGTH = 32
 
- def __lt__(self, other):
-    return self.freq < other.freq
+# Node ids below this are leaves whose id is the byte value itself
+LEAF_COUNT = 256
+
+class HuffmanArrays:
+ __slots__ = ("freq", "left", "right")
+
+ def __init__(self):
+    # Structure-of-arrays tree: 256 leaves plus at most 255 internal nodes
+    size = 2 * LEAF_COUNT - 1
+    self.freq = np.zeros(size, dtype=np.int64)
+    self.left = np.full(size, -1, dtype=np.int32)
+    self.right = np.full(size, -1, dtype=np.int32)
 
 class HuffmanLogic:
+ def frequencies(self, data):
+    # Frequency analysis of the input byte data over the fixed 256-symbol alphabet
+    return np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+
  def build_tree(self, data):
-    # Frequency analysis of the input byte data
-    freqs = Counter(data)
-    # Build a priority queue for leaf nodes
-    priority_queue = [HuffmanNode(char, freq) for char, freq in freqs.items()]
-    heapq.heapify(priority_queue)
-
-    # Iteratively merge nodes to form the binary tree
-    while len(priority_queue) > 1:
-        left = heapq.heappop(priority_queue)
-        right = heapq.heappop(priority_queue)
-        merged = HuffmanNode(None, left.freq + right.freq)
-        merged.left = left
-        merged.right = right
-        heapq.heappush(priority_queue, merged)
-
-    return priority_queue[0] if priority_queue else None
-
- def generate_codes(self, node, current_code="", codes={}):
-    if node is None:
-        return
-    if node.char is not None:
-        codes[node.char] = current_code
-        self.generate_codes(node.left, current_code + "0", codes)
-        self.generate_codes(node.right, current_code + "1", codes)
+    return self._build_tree_from_freqs(self.frequencies(data))
+
+ def _build_tree_from_freqs(self, freqs):
+    # Returns (arrays, root id); the id is only meaningful alongside its own arrays
+    tree = HuffmanArrays()
+    tree.freq[:LEAF_COUNT] = freqs
+    present = np.flatnonzero(freqs)
+    if len(present) == 0:
+        return tree, None
+    if len(present) == 1:
+        return tree, int(present[0])
+
+    # Two-queue build: leaves sorted by frequency form one FIFO queue, merged
+    # nodes are produced in non-decreasing weight order and form the second.
+    # The merge runs on plain lists and is copied into the arrays once at the end.
+    leaves = present[np.argsort(freqs[present], kind="stable")].tolist()
+    freq = tree.freq.tolist()
+    left = []
+    right = []
+    leaf = 0
+    internal = LEAF_COUNT
+    for node in range(LEAF_COUNT, LEAF_COUNT + len(leaves) - 1):
+        # Take the lighter queue front twice; leaves win ties so trees stay shallow
+        if leaf < len(leaves) and (internal == node or freq[leaves[leaf]] <= freq[internal]):
+            first = leaves[leaf]
+            leaf += 1
+        else:
+            first = internal
+            internal += 1
+        if leaf < len(leaves) and (internal == node or freq[leaves[leaf]] <= freq[internal]):
+            second = leaves[leaf]
+            leaf += 1
+        else:
+            second = internal
+            internal += 1
+        left.append(first)
+        right.append(second)
+        freq[node] = freq[first] + freq[second]
+
+    end = LEAF_COUNT + len(left)
+    tree.freq[:] = freq
+    tree.left[LEAF_COUNT:end] = left
+    tree.right[LEAF_COUNT:end] = right
+    return tree, end - 1
+
+ def generate_codes(self, tree):
+    # Codes are (code_int, nbits) pairs so the encoder can shift them in directly
+    arrays, root = tree
+    codes = {}
+    if root is None:
+        return codes
+    # A single-symbol tree still needs one bit per symbol
+    if root < LEAF_COUNT:
+        codes[root] = (0, 1)
         return codes
+
+    # Walk plain-list copies; indexing numpy arrays element by element is slow
+    left = arrays.left.tolist()
+    right = arrays.right.tolist()
+    stack = [(root, 0, 0)]
+    while stack:
+        node, code, depth = stack.pop()
+        if node < LEAF_COUNT:
+            codes[node] = (code, depth)
+        else:
+            stack.append((left[node], code << 1, depth + 1))
+            stack.append((right[node], (code << 1) | 1, depth + 1))
+    return codes
+
+ def code_lengths(self, freqs):
+    # Per-symbol code lengths for a 256-entry histogram (0 for absent bytes)
+    while True:
+        lengths = self._leaf_depths(self._build_tree_from_freqs(freqs))
+        if max(lengths) <= MAX_CODE_LENGTH:
+            return lengths
+        # Flatten the distribution (as bzip2 does) until the deepest code fits
+        freqs = np.where(freqs > 0, (freqs >> 1) + 1, 0)
+
+ def _leaf_depths(self, tree):
+    arrays, root = tree
+    depth = [0] * (2 * LEAF_COUNT - 1)
+    if root is None:
+        return depth[:LEAF_COUNT]
+    if root < LEAF_COUNT:
+        depth[root] = 1
+        return depth[:LEAF_COUNT]
+    # Children always have lower ids than their parent, so one descending pass
+    # from the root reaches every node after its parent
+    left = arrays.left.tolist()
+    right = arrays.right.tolist()
+    for node in range(root, LEAF_COUNT - 1, -1):
+        child_depth = depth[node] + 1
+        depth[left[node]] = child_depth
+        depth[right[node]] = child_depth
+    return depth[:LEAF_COUNT]
+
+ def canonical_codes(self, lengths):
+    # Assign canonical (code_int, nbits) pairs from code lengths alone, so only
+    # the lengths need to travel in the header
+    symbols = sorted((length, char) for char, length in enumerate(lengths) if length)
+    codes = {}
+    code = 0
+    for i, (length, char) in enumerate(symbols):
+        codes[char] = (code, length)
+        if i + 1 < len(symbols):
+            code = (code + 1) << (symbols[i + 1][0] - length)
+    return codes
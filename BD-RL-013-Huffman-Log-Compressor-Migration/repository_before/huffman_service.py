@@ -1,29 +1,257 @@
 
 # // filename: huffman_service.py
 
-from huffman_core import HuffmanLogic
+import functools
+import struct
+import sys
+
+import numpy as np
+
+from huffman_core import MAX_CODE_LENGTH, HuffmanLogic
+
+try:
+    import numba
+except ImportError:  # fall back to the interpreted encode loop
+    numba = None
+
+# Header: one code length per byte value, pad bits in the last byte, original length
+_HEADER = struct.Struct(">256sBQ")
+
+# Codes up to this many bits decode with a single table lookup
+_FAST_BITS = 10
+
+# The interpreted encoder hands bytes to int.to_bytes once this many bits are pending
+_FLUSH_BITS = 256
+
+# Inputs at least this large are encoded two bytes per step through a pair table.
+# Building the table costs ~20-30 ms and histograms rarely repeat exactly, so it
+# only pays for itself once the input itself is this big (measured break-even)
+_PAIR_MIN_BYTES = 512 * 1024
+
+
+def _encode(data, code_val, code_len, out, pos):
+    # Pack the code of every byte in data into out starting at pos; returns the
+    # next write position plus the bits still pending in the accumulator
+    acc = 0
+    nbits = 0
+    for i in range(data.size):
+        char = data[i]
+        length = code_len[char]
+        acc = (acc << length) | code_val[char]
+        nbits += length
+        while nbits >= 8:
+            nbits -= 8
+            out[pos] = (acc >> nbits) & 0xFF
+            pos += 1
+        acc &= (1 << nbits) - 1
+    return pos, nbits, acc
+
+
+def _decode(payload, total_bits, fast, first_code, first_index, counts, symbols, peek_bits, out):
+    # Decode len(out) symbols from payload; returns the number of bits consumed,
+    # or -1 when the bitstream runs short or holds an unassigned code
+    acc = 0
+    nbits = 0
+    pos = 0
+    used = 0
+    for j in range(len(out)):
+        # Keep at least peek_bits buffered, feeding zeros past the end of the payload
+        while nbits < peek_bits:
+            byte = payload[pos] if pos < len(payload) else 0
+            acc = (acc << 8) | byte
+            nbits += 8
+            pos += 1
+        entry = fast[(acc >> (nbits - _FAST_BITS)) & ((1 << _FAST_BITS) - 1)]
+        if entry:
+            char = entry >> 4
+            length = entry & 0xF
+        else:
+            # Codes longer than _FAST_BITS: walk the canonical ranges length by length
+            length = 0
+            for bits in range(_FAST_BITS + 1, peek_bits + 1):
+                index = (acc >> (nbits - bits)) - first_code[bits]
+                if 0 <= index < counts[bits]:
+                    char = symbols[first_index[bits] + index]
+                    length = bits
+                    break
+            if length == 0:
+                return -1
+        used += length
+        if used > total_bits:
+            return -1
+        nbits -= length
+        acc &= (1 << nbits) - 1
+        out[j] = char
+    return used
+
+
+def _build_decode_tables(codes):
+    # Build the fast lookup table plus the per-length canonical ranges used by _decode
+    fast = np.zeros(1 << _FAST_BITS, dtype=np.uint16)
+    first_code = np.zeros(MAX_CODE_LENGTH + 1, dtype=np.int64)
+    first_index = np.zeros(MAX_CODE_LENGTH + 1, dtype=np.int64)
+    counts = np.zeros(MAX_CODE_LENGTH + 1, dtype=np.int64)
+    symbols = np.zeros(len(codes), dtype=np.int64)
+    ordered = sorted((length, code, char) for char, (code, length) in codes.items())
+    for i, (length, code, char) in enumerate(ordered):
+        symbols[i] = char
+        if counts[length] == 0:
+            first_code[length] = code
+            first_index[length] = i
+        counts[length] += 1
+        if length <= _FAST_BITS:
+            # Every table slot whose top bits equal the code maps to this symbol
+            shift = _FAST_BITS - length
+            fast[code << shift:(code + 1) << shift] = (char << 4) | length
+    peek_bits = max(_FAST_BITS, ordered[-1][0])
+    return fast, first_code, first_index, counts, symbols, peek_bits
+
+
+# The interpreted kernels stay importable so the fallback path never hands
+# Python lists to the compiled versions
+if numba is not None:
+    _encode_jit = numba.njit(cache=True, boundscheck=False)(_encode)
+    _decode_jit = numba.njit(cache=True, boundscheck=False)(_decode)
 
 
 class HuffmanService:
     def __init__(self):
         self.logic = HuffmanLogic()
+        # Log payloads keep producing the same histograms and headers, so the
+        # derived code tables are memoized per instance
+        self._encode_tables = functools.lru_cache(maxsize=64)(self._encode_tables)
+        self._decode_tables = functools.lru_cache(maxsize=64)(self._decode_tables)
+        self._pair_tables = functools.lru_cache(maxsize=8)(self._pair_tables)
+
+    def _encode_tables(self, hist):
+        # hist is the raw int64 histogram, passed as bytes so it can key the cache
+        lengths = self.logic.code_lengths(np.frombuffer(hist, dtype=np.int64))
+        codes = self.logic.canonical_codes(lengths)
+
+        # Flatten the code table into 256-entry lists so the hot loop indexes instead of hashing
+        code_val = [0] * 256
+        code_len = [0] * 256
+        for char, (value, length) in codes.items():
+            code_val[char] = value
+            code_len[char] = length
+        if numba is not None:
+            code_val = np.array(code_val, dtype=np.int64)
+            code_len = np.array(code_len, dtype=np.int64)
+        return code_val, code_len, bytes(lengths)
+
+    def _pair_tables(self, hist):
+        # Concatenated codes for every byte pair, indexed the way memoryview.cast("H")
+        # reads two bytes in native order; lets the interpreted loop take half the steps
+        code_val, code_len, _ = self._encode_tables(hist)
+        if sys.byteorder == "little":
+            pairs = [(first, second) for second in range(256) for first in range(256)]
+        else:
+            pairs = [(first, second) for first in range(256) for second in range(256)]
+        pair_val = [(code_val[first] << code_len[second]) | code_val[second] for first, second in pairs]
+        pair_len = [code_len[first] + code_len[second] for first, second in pairs]
+        return pair_val, pair_len
+
+    def _decode_tables(self, lengths):
+        if max(lengths) > MAX_CODE_LENGTH:
+            raise ValueError("corrupted header")
+        # The lengths must describe a complete prefix code (a lone symbol uses one bit)
+        kraft = sum(1 << (MAX_CODE_LENGTH - length) for length in lengths if length)
+        symbols = sum(1 for length in lengths if length)
+        if kraft != 1 << MAX_CODE_LENGTH and not (symbols == 1 and max(lengths) == 1):
+            raise ValueError("corrupted header")
+
+        tables = _build_decode_tables(self.logic.canonical_codes(lengths))
+        if numba is None:
+            tables = tuple(t.tolist() if isinstance(t, np.ndarray) else t for t in tables)
+        return tables
 
     def compress(self, data):
         if not data:
             return b""
-        tree = self.logic.build_tree(data)
-        codes = self.logic.generate_codes(tree)
-
-        # Python string concatenation approach is the primary performance bottleneck
-        encoded_str = "".join([codes[char] for char in data])
-
-        # Calculate padding needed for byte alignment
-        padding = 8 - (len(encoded_str) % 8)
-        encoded_str += "0" * padding
-
-        # Manual conversion of bit-string to bytearray
-        b = bytearray()
-        for i in range(0, len(encoded_str), 8):
-            byte = encoded_str[i:i+8]
-            b.append(int(byte, 2))
-        return bytes(b)
+        freqs = self.logic.frequencies(data).astype(np.int64, copy=False)
+        hist = freqs.tobytes()
+        code_val, code_len, lengths = self._encode_tables(hist)
+
+        # The histogram gives the exact payload size, so the output is allocated once
+        total_bits = int(np.dot(freqs, np.asarray(code_len, dtype=np.int64)))
+        size = _HEADER.size + (total_bits + 7) // 8
+
+        if numba is not None:
+            out = np.empty(size, dtype=np.uint8)
+            pos, nbits, acc = _encode_jit(
+                np.frombuffer(data, dtype=np.uint8), code_val, code_len, out, _HEADER.size,
+            )
+        else:
+            # Shift each code into an integer accumulator and serialize whole bytes
+            # in batches through int.to_bytes rather than one append per byte
+            if len(data) >= _PAIR_MIN_BYTES:
+                even = len(data) & ~1
+                symbols = memoryview(data)[:even].cast("H")
+                table_val, table_len = self._pair_tables(hist)
+                tail = data[even:]
+            else:
+                symbols = data
+                table_val, table_len = code_val, code_len
+                tail = b""
+
+            out = bytearray(size)
+            pos = _HEADER.size
+            acc = 0
+            nbits = 0
+            for symbol in symbols:
+                length = table_len[symbol]
+                acc = (acc << length) | table_val[symbol]
+                nbits += length
+                if nbits >= _FLUSH_BITS:
+                    nbytes = nbits >> 3
+                    nbits &= 7
+                    out[pos:pos + nbytes] = (acc >> nbits).to_bytes(nbytes, "big")
+                    pos += nbytes
+                    acc &= (1 << nbits) - 1
+            for char in tail:
+                acc = (acc << code_len[char]) | code_val[char]
+                nbits += code_len[char]
+            if nbits >= 8:
+                nbytes = nbits >> 3
+                nbits &= 7
+                out[pos:pos + nbytes] = (acc >> nbits).to_bytes(nbytes, "big")
+                pos += nbytes
+                acc &= (1 << nbits) - 1
+
+        # Pad the final byte with zero bits and record the pad length in the header;
+        # both buffers are filled in place and copied out exactly once
+        padding = 0
+        if nbits:
+            padding = 8 - nbits
+            out[pos] = (acc << padding) & 0xFF
+        _HEADER.pack_into(out, 0, lengths, padding, len(data))
+        return bytes(out)
+
+    def decompress(self, data):
+        if not data:
+            return b""
+        if len(data) < _HEADER.size:
+            raise ValueError("truncated header")
+        lengths, padding, count = _HEADER.unpack_from(data)
+        if padding > 7:
+            raise ValueError("corrupted header")
+        fast, first_code, first_index, counts, symbols, peek_bits = self._decode_tables(lengths)
+
+        payload = data[_HEADER.size:]
+        total_bits = len(payload) * 8 - padding
+        # Every symbol takes at least one bit, which also bounds the output allocation
+        if count > total_bits:
+            raise ValueError("truncated or corrupted bitstream")
+        if numba is not None:
+            decode = _decode_jit
+            out = np.empty(count, dtype=np.uint8)
+            payload = np.frombuffer(payload, dtype=np.uint8)
+        else:
+            decode = _decode
+            out = bytearray(count)
+        used = decode(
+            payload, total_bits, fast, first_code, first_index, counts, symbols, peek_bits, out,
+        )
+        if used != total_bits:
+            raise ValueError("truncated or corrupted bitstream")
+        return bytes(out)
@@ -78,6 +78,34 @@ def test_small_inputs():
 		assert out == data
 
 
+def test_roundtrip_skewed_long_codes():
+	svc = _get_service()
+
+	# Fibonacci frequencies give a maximally deep tree, so some codes exceed the fast decode table
+	freqs = [1, 1]
+	while len(freqs) < 20:
+		freqs.append(freqs[-1] + freqs[-2])
+	data = b''.join(bytes([b]) * f for b, f in enumerate(freqs))
+	compressed = svc.compress(data)
+	assert max(compressed[:256]) > 10
+	assert svc.decompress(compressed) == data
+
+
+def test_pure_python_path_matches_jit(monkeypatch):
+	svc = _get_service()
+
+	# odd length above the pair-table threshold exercises the pair loop and its tail byte
+	lines = b''.join(b'id=%d status=200\n' % random.getrandbits(20) for _ in range(hs._PAIR_MIN_BYTES // 16))
+	data = lines[:hs._PAIR_MIN_BYTES + 1]
+	expected = svc.compress(data)
+
+	monkeypatch.setattr(hs, 'numba', None)
+	pure = hs.HuffmanService()
+	compressed = pure.compress(data)
+	assert compressed == expected
+	assert pure.decompress(compressed) == data
+
+
 def test_codes_consistency():
 	# Sanity checks for presence of logic API without invoking build_tree
 	if IMPORT_ERROR:
@@ -89,6 +117,37 @@ def test_codes_consistency():
 	assert callable(getattr(logic, 'generate_codes'))
 
 
+def test_generate_codes_fresh_per_call():
+	if IMPORT_ERROR:
+		pytest.skip(f"cannot import repository_before modules: {IMPORT_ERROR}")
+	logic = hc.HuffmanLogic()
+	first = logic.generate_codes(logic.build_tree(b'aab'))
+	second = logic.generate_codes(logic.build_tree(b'xyz'))
+	assert set(first) == set(b'ab')
+	assert set(second) == set(b'xyz')
+	assert logic.generate_codes(logic.build_tree(b'AAAA')) == {ord('A'): (0, 1)}
+
+
+def test_generate_codes_interleaved_builds():
+	if IMPORT_ERROR:
+		pytest.skip(f"cannot import repository_before modules: {IMPORT_ERROR}")
+	logic = hc.HuffmanLogic()
+	first = logic.build_tree(b'aaabbbcccdddeeefff')
+	logic.build_tree(b'xy')
+	assert set(logic.generate_codes(first)) == set(b'abcdef')
+
+
+def test_header_serialization_deterministic():
+	svc = _get_service()
+
+	data = b'GET /index.html 200\n' * 64
+	assert svc.compress(data) == svc.compress(data)
+	# the header carries one code length per byte value; absent bytes get none
+	header = svc.compress(data)[:256]
+	assert all(header[b] for b in set(data))
+	assert not any(header[b] for b in range(256) if b not in data)
+
+
 def test_truncated_stream_behavior():
 	svc = _get_service()
 
@@ -0,0 +1,29 @@
+import os
+import sys
+import time
+import subprocess
+import pytest
+
+# Add evaluation to path
+EVALUATION_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'evaluation'))
+if EVALUATION_DIR not in sys.path:
+	sys.path.insert(0, EVALUATION_DIR)
+
+import evaluation
+
+
+@pytest.mark.skipif(not hasattr(os, 'killpg'), reason="process groups are POSIX-only")
+def test_stream_command_timeout_kills_grandchildren():
+	# The backgrounded sleep inherits the pipes, so only killing the whole
+	# group lets the read loop see EOF once the timeout fires
+	lines = []
+	start = time.monotonic()
+	with pytest.raises(subprocess.TimeoutExpired):
+		evaluation.stream_command(
+			['sh', '-c', 'sleep 15 & echo started; sleep 15'],
+			cwd=os.path.dirname(__file__),
+			timeout=1,
+			on_line=lines.append,
+		)
+	assert time.monotonic() - start < 5
+	assert lines == ['started\n']